@@ -0,0 +1,327 @@
+import geopandas as gpd
+import osmnx as ox
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+
+from uoi_core import (KNN_K, SERVICE_WEIGHTS, SIG_LEVEL, TRAFFIC_PENALTY, WALK_SPEED,
+                      add_lisa_clusters, add_travel_times, add_uoi_scores,
+                      download_graph, nearest_nodes, nearest_service_minutes,
+                      read_layers, speed_config, utm_crs_for)
+
+# --- CONFIGURATION ---
+# Each city needs an OSM place name and a folder with the same raw files
+# as data/raw/ (hospitals.csv, schools.csv, transport.csv, wards.geojson).
+# "crs" is optional: if missing we pick the UTM zone of the ward centroid.
+# "expected_wards" is optional: same sanity check as ward_check.py.
+CITIES = [
+    {
+        "name": "Vadodara",
+        "place": "Vadodara, India",
+        "raw_dir": "data/raw",
+        "expected_wards": 19,
+    },
+]
+
+CACHE_DIR = "data/cache"           # Graphs, snapped nodes and KNN weights live here
+CITY_OUTPUT_DIR = "data/processed/cities"
+OUTPUT_GPKG = "data/processed/india_cities_uoi.gpkg"
+OUTPUT_LAYER = "wards_uoi"
+
+# Memory budget for the whole batch (GB), counted as resident memory (RSS).
+# The parent keeps PARENT_RESERVE_GB (it holds every finished city); the rest
+# is split between workers, each needing roughly PER_CITY_GB.
+MEMORY_BUDGET_GB = 8
+PER_CITY_GB = 2
+PARENT_RESERVE_GB = 1
+
+# Cached OSM graphs older than this are downloaded again (roads change).
+# Use --refresh-graphs to force a new download regardless of age.
+GRAPH_MAX_AGE_DAYS = 80
+
+def slugify(name):
+    """Turns 'New Delhi' into 'new_delhi' for file names."""
+    return "".join(c if c.isalnum() else "_" for c in name.lower()).strip("_")
+
+
+def city_crs(city, wards):
+    """Uses the configured CRS, or picks UTM from the centre of the wards' extent."""
+    return city.get("crs") or utm_crs_for(wards)
+
+
+def cache_key(*parts):
+    """Short hash so caches are rebuilt when the inputs change."""
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(str(p).encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
+def load_layers(city):
+    """Reads raw wards + services for a city and projects them to its CRS."""
+    return read_layers(city["raw_dir"], city.get("crs"), label=city["name"])
+
+
+def load_compiled_graph(city, crs, refresh=False):
+    """
+    Returns the projected drive graph with travel-time weights already on
+    the edges. Downloading + projecting + weighting is done once per city;
+    later runs load the cached GraphML until it is older than
+    GRAPH_MAX_AGE_DAYS or refresh=True.
+    """
+    key = cache_key(city["place"], crs, TRAFFIC_PENALTY, WALK_SPEED,
+                    sorted(speed_config.items()))
+    path = os.path.join(CACHE_DIR, "graphs", f"{slugify(city['name'])}_{key}.graphml")
+
+    if os.path.exists(path):
+        age_days = (time.time() - os.path.getmtime(path)) / 86400
+        if not refresh and age_days <= GRAPH_MAX_AGE_DAYS:
+            print(f"[{city['name']}] Using cached graph {path} ({age_days:.0f} days old)")
+            return ox.load_graphml(path, edge_dtypes={
+                "drive_time_sec": float, "walk_time_sec": float})
+        refresh = True
+        print(f"[{city['name']}] Cached graph is {age_days:.0f} days old, refreshing...")
+
+    print(f"[{city['name']}] Fetching graph from OSM...")
+    # osmnx's own HTTP cache would hand back the old download, so skip it on refresh
+    G = add_travel_times(download_graph(city["place"], crs, use_cache=not refresh))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ox.save_graphml(G, path)
+    return G
+
+
+def snap_points(city, G, name, xs, ys):
+    """
+    Nearest graph node for each point, cached on disk. The key includes the
+    graph's creation date and size and the coordinates, so a new graph or
+    new data re-snaps.
+    """
+    xs, ys = list(xs), list(ys)
+    key = cache_key(G.graph.get("created_date"), len(G.nodes), len(G.edges), xs, ys)
+    path = os.path.join(CACHE_DIR, "snapping", slugify(city["name"]), f"{name}_{key}.pkl")
+
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    nodes = nearest_nodes(G, xs, ys)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump(nodes, f)
+    return nodes
+
+
+def load_knn_weights(city, gdf, k=KNN_K):
+    """KNN spatial weights (as in spatial_Analysis.py), cached as a neighbour dict."""
+    from libpysal.weights import KNN, W
+
+    # Neighbours depend on where the wards are, so key on centroids + CRS
+    centroids = gdf.geometry.centroid
+    key = cache_key(k, gdf.crs, [(round(x, 1), round(y, 1))
+                                 for x, y in zip(centroids.x, centroids.y)])
+    path = os.path.join(CACHE_DIR, "weights", f"{slugify(city['name'])}_{key}.json")
+
+    if os.path.exists(path):
+        with open(path) as f:
+            neighbors = {int(i): n for i, n in json.load(f).items()}
+        w = W(neighbors, silence_warnings=True)
+    else:
+        w = KNN.from_dataframe(gdf, k=k)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({str(i): list(map(int, n)) for i, n in w.neighbors.items()}, f)
+
+    w.transform = 'r'
+    return w
+
+
+def current_rss_gb():
+    """Resident memory of this process in GB, or None if we can't measure it."""
+    try:
+        with open("/proc/self/statm") as f:  # Linux: current RSS in pages
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024**3
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024**3
+    except ImportError:
+        pass
+    try:
+        import resource  # Peak RSS: KB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024**3 if sys.platform == "darwin" else 1024**2)
+    except ImportError:
+        return None  # Windows without psutil
+
+
+def check_memory(name, stage, limit_gb):
+    """Fails the city (not the pool) when its worker uses more than limit_gb."""
+    if not limit_gb:
+        return
+    used = current_rss_gb()
+    if used is not None and used > limit_gb:
+        raise MemoryError(f"{used:.1f} GB resident after {stage} "
+                          f"(limit {limit_gb:.1f} GB per city)")
+
+
+def run_city(city, limit_gb=None, refresh_graphs=False):
+    """Runs database -> accessibility -> PCA index -> LISA for one city."""
+    name = city["name"]
+    print(f"--- [{name}] STARTING ---")
+
+    # 1. DATABASE
+    wards, services, crs = load_layers(city)
+    check_memory(name, "loading layers", limit_gb)
+    print(f"[{name}] {len(wards)} wards, CRS {crs}")
+    expected = city.get("expected_wards")
+    if expected and len(wards) != expected:
+        print(f"⚠️ [{name}] Warning: expected {expected} wards, found {len(wards)}.")
+
+    # 2. ACCESSIBILITY
+    G = load_compiled_graph(city, crs, refresh=refresh_graphs)
+    check_memory(name, "loading the graph", limit_gb)
+    G_rev = G.reverse(copy=False)
+    centroids = wards.geometry.centroid
+    origin_nodes = snap_points(city, G, "wards", centroids.x, centroids.y)
+
+    features = []
+    for layer_name, (column, weight_col) in SERVICE_WEIGHTS.items():
+        if layer_name not in services:
+            continue
+        pts = services[layer_name]
+        dest_nodes = snap_points(city, G, layer_name, pts.geometry.x, pts.geometry.y)
+        wards[column] = nearest_service_minutes(G_rev, origin_nodes, dest_nodes, weight_col)
+        features.append(column)
+        check_memory(name, f"routing {layer_name}", limit_gb)
+    del G, G_rev
+
+    if not features:
+        raise ValueError(f"No service layers found for {name}")
+
+    # 3. PCA INDEX (same steps as pca_scores.py)
+    add_uoi_scores(wards, features)
+
+    # 4. LISA (needs more wards than neighbours)
+    if len(wards) > KNN_K:
+        w = load_knn_weights(city, wards)
+        add_lisa_clusters(wards, w, SIG_LEVEL)
+    else:
+        print(f"⚠️ [{name}] Too few wards for LISA (k={KNN_K}). Skipping.")
+
+    # 5. SAVE PER-CITY RESULT (in its own UTM CRS)
+    os.makedirs(CITY_OUTPUT_DIR, exist_ok=True)
+    city_gpkg = os.path.join(CITY_OUTPUT_DIR, f"{slugify(name)}.gpkg")
+    wards.to_file(city_gpkg, layer="wards_final_index", driver="GPKG")
+
+    wards['city'] = name
+    wards['city_crs'] = crs
+    print(f"✅ [{name}] Done -> {city_gpkg}")
+    # Back to lon/lat so cities in different UTM zones can share one layer
+    return wards.to_crs("EPSG:4326")
+
+
+def check_city_names(cities):
+    """Names (and their file-name slugs) key results and caches, so they must be unique."""
+    seen = {}
+    for city in cities:
+        name = city.get("name")
+        if not name:
+            raise ValueError(f"City config without a name: {city}")
+        slug = slugify(name)
+        if slug in seen:
+            raise ValueError(f"Duplicate city name: '{name}' clashes with '{seen[slug]}'")
+        seen[slug] = name
+
+
+def run_batch(cities, memory_budget_gb=MEMORY_BUDGET_GB, per_city_gb=PER_CITY_GB,
+              refresh_graphs=False):
+    """Runs all cities in a process pool and writes one combined GeoPackage."""
+    check_city_names(cities)
+
+    # The parent's share comes off the top; workers split what is left
+    parent_gb = max(PARENT_RESERVE_GB, current_rss_gb() or 0)
+    worker_budget_gb = memory_budget_gb - parent_gb
+    if worker_budget_gb < per_city_gb:
+        raise ValueError(f"Memory budget {memory_budget_gb} GB leaves {worker_budget_gb:.1f} GB "
+                         f"for workers, less than PER_CITY_GB ({per_city_gb} GB)")
+    workers = max(1, min(len(cities), os.cpu_count() or 1,
+                         int(worker_budget_gb // per_city_gb)))
+    limit_gb = worker_budget_gb / workers
+    print(f"--- BATCH: {len(cities)} cities, {workers} workers, "
+          f"{limit_gb:.1f} GB each + {parent_gb:.1f} GB parent "
+          f"({memory_budget_gb} GB budget) ---")
+
+    if current_rss_gb() is None:
+        print("⚠️ Can't measure memory here (install psutil). "
+              "Only the worker count keeps the batch within budget.")
+
+    # max_tasks_per_child=1: every city gets a fresh process, so it starts with
+    # the full per-city budget instead of the fragmented heap of the last city
+    pool_kwargs = {}
+    if sys.version_info >= (3, 11):
+        pool_kwargs["max_tasks_per_child"] = 1
+
+    by_city = {}
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers, **pool_kwargs) as pool:
+        futures = {pool.submit(run_city, city, limit_gb, refresh_graphs): city["name"]
+                   for city in cities}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                by_city[name] = future.result()
+            except Exception as e:
+                print(f"❌ [{name}] Failed: {e}")
+                failed.append(name)
+                continue
+            used = current_rss_gb()
+            if used is not None and used > parent_gb:
+                print(f"⚠️ Parent process uses {used:.1f} GB, over its "
+                      f"{parent_gb:.1f} GB share of the budget.")
+
+    # Input order, not finishing order, so quarterly outputs diff cleanly
+    results = [by_city[c["name"]] for c in cities if c["name"] in by_city]
+    failed = [c["name"] for c in cities if c["name"] in failed]
+
+    if not results:
+        print("❌ No city finished. Nothing saved.")
+        return None
+
+    combined = gpd.GeoDataFrame(pd.concat(results, ignore_index=True), crs="EPSG:4326")
+    os.makedirs(os.path.dirname(OUTPUT_GPKG), exist_ok=True)
+    combined.to_file(OUTPUT_GPKG, layer=OUTPUT_LAYER, driver="GPKG")
+
+    print(f"🎉 Saved {len(combined)} wards from {len(results)} cities to "
+          f"{OUTPUT_GPKG} (layer '{OUTPUT_LAYER}')")
+    if failed:
+        print(f"⚠️ Failed cities: {', '.join(failed)}")
+    return combined
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the UOI pipeline for many cities")
+    parser.add_argument("cities", nargs="?",
+                        help="JSON file with a list of city configs (default: CITIES)")
+    parser.add_argument("--refresh-graphs", action="store_true",
+                        help="Download every OSM graph again, ignoring the cache")
+    parser.add_argument("--memory-budget-gb", type=float, default=MEMORY_BUDGET_GB)
+    args = parser.parse_args()
+
+    cities = CITIES
+    if args.cities:
+        with open(args.cities) as f:
+            cities = json.load(f)
+    try:
+        run_batch(cities, memory_budget_gb=args.memory_budget_gb,
+                  refresh_graphs=args.refresh_graphs)
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
@@ -0,0 +1,12 @@
+import geopandas as gpd
+from batch_cities import city_crs
+
+# Check that the automatic CRS choice in batch_cities.py picks the
+# Vadodara standard (UTM Zone 43N) for our own ward file
+wards = gpd.read_file("data/raw/wards.geojson")
+
+crs = city_crs({"name": "Vadodara"}, wards)
+print(f"Automatic CRS: {crs}")
+
+assert crs == "EPSG:32643", f"Expected EPSG:32643, got {crs}"
+print("✅ correct: Ward file maps to UTM Zone 43N (EPSG:32643).")
@@ -0,0 +1,294 @@
+"""
+One command line for the whole pipeline.
+
+    python scripts/uoi.py check
+    python scripts/uoi.py build-db --config uoi.json
+    python scripts/uoi.py accessibility --graph-file other.graphml
+
+Heavy libraries (osmnx, geopandas, sklearn, esda, matplotlib...) are only
+imported inside the subcommands that use them, so light commands like
+'check' start instantly. Settings come from DEFAULTS, then the JSON file
+given with --config, then any flag on the command line.
+"""
+import argparse
+from contextlib import closing
+import json
+import os
+import sqlite3
+import sys
+
+from uoi_core import (KNN_K, SERVICE_WEIGHTS, SIG_LEVEL, add_lisa_clusters,
+                      add_travel_times, add_uoi_scores, download_graph,
+                      nearest_nodes, nearest_service_minutes, read_layers)
+
+# --- CONFIGURATION ---
+# Same values the single scripts use. Override in a JSON file or by flags.
+DEFAULTS = {
+    "place": "Vadodara, India",
+    "crs": "EPSG:32643",                 # UTM Zone 43N
+    "raw_dir": "data/raw",
+    "data_file": "vadodara_project_data.gpkg",
+    "graph_file": "vadodara_network_drive.graphml",
+    "roads_file": "vadodara_roads.gpkg",
+    "accessibility_csv": "ward_accessibility_scores_realistic.csv",
+    "index_csv": "ward_pca_scores.csv",
+    "map_file": "inequality_map.png",
+    "expected_wards": 19,
+    "knn_k": KNN_K,
+    "sig_level": SIG_LEVEL,
+}
+
+
+def load_config(args):
+    """DEFAULTS <- JSON config file <- command line flags."""
+    config = dict(DEFAULTS)
+    if args.config:
+        try:
+            with open(args.config) as f:
+                from_file = json.load(f)
+        except OSError as e:
+            sys.exit(f"❌ Could not read config {args.config}: {e}")
+        except json.JSONDecodeError as e:
+            sys.exit(f"❌ Invalid JSON in {args.config}: {e}")
+        if not isinstance(from_file, dict):
+            sys.exit(f"❌ Config {args.config} must be a JSON object, "
+                     f"got {type(from_file).__name__}")
+
+        unknown = set(from_file) - set(DEFAULTS)
+        if unknown:
+            sys.exit(f"❌ Unknown config keys in {args.config}: {', '.join(sorted(unknown))}")
+        for key, value in from_file.items():
+            # Only exact types: no silent 19.9 -> 19 or null -> "None".
+            # bool is rejected for numbers, int is fine for a float setting.
+            expected = type(DEFAULTS[key])
+            ok = isinstance(value, expected) and not isinstance(value, bool)
+            if expected is float and isinstance(value, int) and not isinstance(value, bool):
+                ok, value = True, float(value)
+            if not ok:
+                sys.exit(f"❌ Bad value for '{key}' in {args.config}: {value!r} "
+                         f"(expected {expected.__name__})")
+            config[key] = value
+    for key in DEFAULTS:
+        value = getattr(args, key, None)
+        if value is not None:
+            config[key] = value
+    return config
+
+
+# --- SUBCOMMANDS ---
+
+def cmd_check(cfg):
+    """Counts wards straight from the GeoPackage (it is SQLite) - no geopandas needed."""
+    path = cfg["data_file"]
+    if not os.path.exists(path):
+        print(f"❌ Error: '{path}' not found. Run 'build-db' first.")
+        return 1
+
+    try:
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as con:
+            tables = {r[0] for r in con.execute("SELECT table_name FROM gpkg_contents")}
+            if "wards" not in tables:
+                print(f"❌ Error: no 'wards' layer in {path}.")
+                return 1
+            n_wards = con.execute('SELECT COUNT(*) FROM "wards"').fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        print(f"❌ Error: '{path}' is not a readable GeoPackage ({e}).")
+        return 1
+
+    print(f"Total Wards Found: {n_wards}")
+    if n_wards == cfg["expected_wards"]:
+        print(f"✅ correct: Data matches the expected {n_wards}-ward structure.")
+        return 0
+    print(f"⚠️ Warning: Your map has {n_wards} polygons. Check for duplicates or missing areas.")
+    return 1
+
+
+def cmd_build_db(cfg):
+    """Raw CSVs + ward GeoJSON -> one projected GeoPackage (as gpkg.py)."""
+    try:
+        wards, services, crs = read_layers(cfg["raw_dir"], cfg["crs"])
+    except FileNotFoundError as e:
+        print(f"❌ CRITICAL: {e}")
+        return 1
+
+    print(f"✅ Wards Loaded: {len(wards)} wards found.")
+    for layer_name, gdf in services.items():
+        print(f"✅ Processed {layer_name}: {len(gdf)} points")
+
+    print(f"Saving to {cfg['data_file']}...")
+    for name, gdf in {"wards": wards, **services}.items():
+        gdf.to_file(cfg["data_file"], layer=name, driver="GPKG")
+    print("🎉 Success! Database ready.")
+    return 0
+
+
+def cmd_fetch_graph(cfg):
+    """Downloads the drive network and saves GraphML + roads layer (as 1.py)."""
+    import osmnx as ox
+
+    print(f"Fetching '{cfg['place']}' from OSM...")
+    G_proj = download_graph(cfg["place"], cfg["crs"])
+    print(f"Downloaded graph with {len(G_proj.nodes)} nodes and {len(G_proj.edges)} edges.")
+
+    nodes, edges = ox.graph_to_gdfs(G_proj)
+    ox.save_graphml(G_proj, cfg["graph_file"])
+    edges.to_file(cfg["roads_file"], layer="roads", driver="GPKG")
+    print(f"✅ Saved {cfg['graph_file']} and {cfg['roads_file']}")
+    return 0
+
+
+def cmd_accessibility(cfg):
+    """Road-speed travel times from ward centroids to services (as re_Acc.py)."""
+    import geopandas as gpd
+    import osmnx as ox
+
+    print("1. Loading Data...")
+    G = add_travel_times(ox.load_graphml(cfg["graph_file"]))
+    G_rev = G.reverse(copy=False)
+    wards = gpd.read_file(cfg["data_file"], layer="wards")
+    centroids = wards.geometry.centroid
+    origin_nodes = nearest_nodes(G, centroids.x, centroids.y)
+
+    print("2. Routing...")
+    columns = []
+    for layer_name, (column, weight_col) in SERVICE_WEIGHTS.items():
+        pts = gpd.read_file(cfg["data_file"], layer=layer_name)
+        dest_nodes = nearest_nodes(G, pts.geometry.x, pts.geometry.y)
+        print(f"   > {layer_name}: {len(origin_nodes)} wards vs {len(dest_nodes)} destinations")
+        wards[column] = nearest_service_minutes(G_rev, origin_nodes, dest_nodes, weight_col)
+        columns.append(column)
+
+    wards[columns].to_csv(cfg["accessibility_csv"], index=True)
+    wards.to_file(cfg["data_file"], layer="wards_realistic_scores", driver="GPKG")
+    print(f"🎉 DONE! Scores saved to {cfg['accessibility_csv']}")
+    return 0
+
+
+def cmd_index(cfg):
+    """PCA of travel times -> 0-100 Urban Opportunity Index (as pca_scores.py)."""
+    if not os.path.exists(cfg["accessibility_csv"]):
+        print(f"❌ Error: '{cfg['accessibility_csv']}' not found. Run 'accessibility' first.")
+        return 1
+
+    import pandas as pd
+    import geopandas as gpd
+
+    df = pd.read_csv(cfg["accessibility_csv"])
+    features = [column for column, _ in SERVICE_WEIGHTS.values() if column in df.columns]
+    if not features:
+        expected = ", ".join(column for column, _ in SERVICE_WEIGHTS.values())
+        print(f"❌ Error: '{cfg['accessibility_csv']}' has none of the travel time "
+              f"columns ({expected}). Run 'accessibility' first.")
+        return 1
+
+    add_uoi_scores(df, features)
+    df.to_csv(cfg["index_csv"], index=False)
+    print(f"✅ CSV Saved: '{cfg['index_csv']}'")
+
+    # The CSV is the main result; like pca_scores.py, only warn if the map layer fails
+    try:
+        try:
+            wards_map = gpd.read_file(cfg["data_file"], layer="wards_realistic_scores")
+        except Exception:
+            wards_map = gpd.read_file(cfg["data_file"], layer="wards")
+        wards_map['UOI_Score'] = df['UOI_Score']
+        wards_map['Rank'] = df['Rank']
+        wards_map.to_file(cfg["data_file"], layer="wards_final_index", driver="GPKG")
+        print(f"✅ Map Layer Saved: 'wards_final_index' inside '{cfg['data_file']}'")
+    except Exception as e:
+        print(f"⚠️ Could not update GeoPackage: {e}")
+    return 0
+
+
+def cmd_lisa(cfg):
+    """Global Moran's I + LISA hotspots with KNN weights (as spatial_Analysis.py)."""
+    import geopandas as gpd
+    from libpysal.weights import KNN
+    from esda.moran import Moran
+
+    gdf = gpd.read_file(cfg["data_file"], layer="wards_final_index")
+    w = KNN.from_dataframe(gdf, k=cfg["knn_k"])
+    w.transform = 'r'
+
+    y = gdf['UOI_Score'].values
+    moran = Moran(y, w)
+    print(f"Global Moran's I Index: {moran.I:.3f} (p = {moran.p_sim:.4f})")
+
+    n_sig = add_lisa_clusters(gdf, w, cfg["sig_level"])
+    print(f"Found {n_sig} significant hotspot/coldspot wards.")
+
+    gdf.to_file(cfg["data_file"], layer="wards_lisa_hotspots", driver="GPKG")
+    print("🎉 Analysis Complete. Layer saved as 'wards_lisa_hotspots'")
+    return 0
+
+
+def cmd_map(cfg):
+    """Choropleth of the UOI score with basemap (as inequality.py)."""
+    import geopandas as gpd
+    import matplotlib
+    matplotlib.use("Agg")  # No window needed, we only save the PNG
+    import matplotlib.pyplot as plt
+
+    gdf = gpd.read_file(cfg["data_file"], layer="wards_final_index")
+    fig, ax = plt.subplots(1, 1, figsize=(10, 10), dpi=300)
+    gdf.plot(column='UOI_Score', cmap='RdYlGn', linewidth=0.8, ax=ax,
+             edgecolor='0.5', legend=True,
+             legend_kwds={'label': "Urban Opportunity Index (0-100)", 'shrink': 0.6},
+             scheme='NaturalBreaks', k=5, alpha=0.8)
+
+    for idx, row in gdf.iterrows():
+        ax.annotate(text=row.get('ward_name', row.get('ward_id', '')),
+                    xy=(row.geometry.centroid.x, row.geometry.centroid.y),
+                    horizontalalignment='center', fontsize=6,
+                    color='black', weight='bold')
+
+    try:
+        import contextily as ctx
+        ctx.add_basemap(ax, crs=gdf.crs.to_string(),
+                        source=ctx.providers.OpenStreetMap.Mapnik, alpha=0.5)
+    except Exception:
+        print("Warning: Could not fetch basemap (internet issue?). Plotting without it.")
+
+    city = cfg["place"].split(",")[0]
+    ax.set_axis_off()
+    ax.set_title(f"Urban Inequality in {city}: Opportunity Index", fontsize=14, fontweight='bold')
+    plt.tight_layout()
+    plt.savefig(cfg["map_file"])
+    print(f"🎉 Map saved as: {cfg['map_file']}")
+    return 0
+
+
+COMMANDS = {
+    "build-db": (cmd_build_db, "Build the projected GeoPackage from data/raw"),
+    "fetch-graph": (cmd_fetch_graph, "Download and save the OSM drive network"),
+    "accessibility": (cmd_accessibility, "Travel times from wards to services"),
+    "index": (cmd_index, "PCA-based Urban Opportunity Index"),
+    "lisa": (cmd_lisa, "Moran's I and LISA hotspots"),
+    "map": (cmd_map, "Render the inequality map"),
+    "check": (cmd_check, "Check the ward count (fast, no heavy imports)"),
+}
+
+
+def build_parser():
+    # Shared options, accepted after any subcommand
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--config", help="JSON file with settings (keys as in DEFAULTS)")
+    for key, value in DEFAULTS.items():
+        common.add_argument("--" + key.replace("_", "-"), dest=key,
+                            type=type(value), default=None,
+                            help=f"default: {value}")
+
+    parser = argparse.ArgumentParser(prog="uoi", description="Urban Inequality pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, (func, help_text) in COMMANDS.items():
+        sub.add_parser(name, parents=[common], help=help_text).set_defaults(func=func)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(load_config(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Pipeline pieces shared by uoi.py and batch_cities.py.
+
+Nothing heavy is imported at the top of this file: geopandas, osmnx,
+networkx, sklearn and esda are only loaded inside the functions that
+need them, so uoi.py can import it without slowing down light commands
+like 'check'.
+"""
+import os
+
+# --- CONFIGURATION ---
+SERVICE_FILES = {
+    "hospitals": "hospitals.csv",
+    "schools": "schools.csv",
+    "transport": "transport.csv"
+}
+
+# Hospitals by car, schools & transport on foot (as in re_Acc.py)
+SERVICE_WEIGHTS = {
+    "hospitals": ("time_hospital_min", "drive_time_sec"),
+    "schools": ("time_school_min", "walk_time_sec"),
+    "transport": ("time_transport_min", "walk_time_sec"),
+}
+
+# "Humane" speeds by road type (km/h), as in re_Acc.py
+speed_config = {
+    'motorway': 60,
+    'trunk': 50,
+    'primary': 40,
+    'secondary': 35,
+    'tertiary': 30,
+    'residential': 15,
+    'living_street': 10,
+    'service': 10,
+    'unclassified': 20,
+    'default': 20
+}
+TRAFFIC_PENALTY = 0.7  # 0.7 = normal day traffic (30% delay)
+WALK_SPEED = 4.5       # km/h
+
+KNN_K = 4
+SIG_LEVEL = 0.05
+
+LISA_LABELS = {
+    1: "High-High (Opportunity Hub)",
+    2: "Low-High (Outlier)",
+    3: "Low-Low (Service Desert)",
+    4: "High-Low (Outlier)",
+}
+
+
+def utm_crs_from_lonlat(lon, lat):
+    """Returns the UTM zone EPSG code (WGS84) for a lon/lat point."""
+    zone = int((lon + 180) // 6) + 1
+    zone = min(max(zone, 1), 60)
+    base = 32600 if lat >= 0 else 32700  # 326xx = North, 327xx = South
+    return f"EPSG:{base + zone}"
+
+
+def utm_crs_for(gdf):
+    """UTM zone for the centre of the layer's extent."""
+    # Bounding box centre is enough to pick a 6-degree zone, and unlike a
+    # union it doesn't fail on invalid ward polygons
+    minx, miny, maxx, maxy = gdf.to_crs("EPSG:4326").total_bounds
+    return utm_crs_from_lonlat((minx + maxx) / 2, (miny + maxy) / 2)
+
+
+def read_layers(raw_dir, crs=None, label=""):
+    """
+    Reads wards.geojson + the service CSVs from raw_dir and projects them to
+    crs (or the wards' UTM zone when crs is None). Missing service files are
+    skipped with a warning. Returns (wards, services dict, crs).
+    """
+    import pandas as pd
+    import geopandas as gpd
+
+    prefix = f"[{label}] " if label else ""
+    ward_path = os.path.join(raw_dir, "wards.geojson")
+    if not os.path.exists(ward_path):
+        raise FileNotFoundError(f"Ward file not found at {ward_path}")
+
+    wards = gpd.read_file(ward_path)
+    crs = crs or utm_crs_for(wards)
+    wards = wards.to_crs(crs)
+    wards['area_sqkm'] = wards.geometry.area / 10**6
+
+    services = {}
+    for layer_name, filename in SERVICE_FILES.items():
+        path = os.path.join(raw_dir, filename)
+        if not os.path.exists(path):
+            print(f"⚠️ {prefix}Warning: {filename} not found in {raw_dir}")
+            continue
+        # Input is standard Lat/Lon (WGS84)
+        df = pd.read_csv(path)
+        gdf = gpd.GeoDataFrame(
+            df,
+            geometry=gpd.points_from_xy(df.longitude, df.latitude),
+            crs="EPSG:4326"
+        )
+        services[layer_name] = gdf.to_crs(crs)
+
+    return wards, services, crs
+
+
+def download_graph(place, crs, use_cache=True):
+    """Downloads the OSM drive network for place and projects it to crs (as 1.py)."""
+    import osmnx as ox
+
+    ox.settings.use_cache = use_cache
+    G = ox.graph_from_place(place, network_type="drive", simplify=True)
+    return ox.project_graph(G, to_crs=crs)
+
+
+def get_speed(highway_tag):
+    if isinstance(highway_tag, list):
+        highway_tag = highway_tag[0]  # Road with multiple tags
+    return speed_config.get(highway_tag, speed_config['default'])
+
+
+def add_travel_times(G):
+    """Adds drive_time_sec / walk_time_sec to every edge (same logic as re_Acc.py)."""
+    walk_speed_mps = WALK_SPEED * (1000 / 3600)
+    for u, v, k, data in G.edges(keys=True, data=True):
+        try:
+            speed = float(str(data['maxspeed']).split()[0]) if 'maxspeed' in data else None
+        except ValueError:
+            speed = None
+        if not speed:
+            speed = get_speed(data.get('highway'))
+
+        dist_m = float(data['length'])
+        data['drive_time_sec'] = dist_m / (speed * TRAFFIC_PENALTY * (1000 / 3600))
+        data['walk_time_sec'] = dist_m / walk_speed_mps
+    return G
+
+
+def nearest_nodes(G, xs, ys):
+    """Nearest graph node for each point ([] when there are no points)."""
+    import osmnx as ox
+
+    xs, ys = list(xs), list(ys)
+    if not xs:
+        return []
+    return list(ox.nearest_nodes(G, X=xs, Y=ys))
+
+
+def nearest_service_minutes(G_rev, origin_nodes, dest_nodes, weight_col):
+    """
+    Minutes from each origin to its nearest destination.
+    One multi-source Dijkstra on the reversed graph replaces the
+    origins x destinations shortest_path_length loop of re_Acc.py.
+    """
+    import networkx as nx
+
+    if len(dest_nodes) == 0:
+        return [None] * len(origin_nodes)  # No services: same as "no path", penalised later
+    dist = nx.multi_source_dijkstra_path_length(G_rev, set(dest_nodes), weight=weight_col)
+    return [dist[o] / 60 if o in dist else None for o in origin_nodes]
+
+
+def add_uoi_scores(df, features):
+    """
+    PCA of travel times -> 0-100 Urban Opportunity Index (as pca_scores.py).
+    Adds PCA_Raw_Value, UOI_Score and Rank columns to df and returns it.
+    The 0-100 scale is relative to the wards in df only.
+    """
+    from sklearn.decomposition import PCA
+    from sklearn.preprocessing import MinMaxScaler
+
+    # Missing times (no path) get a penalty, then invert so High = GOOD
+    X = df[features].fillna(df[features].max() * 1.1)
+    pca = PCA(n_components=1)
+    pcs = pca.fit_transform(X * -1)
+
+    # The sign of PC1 is arbitrary. Point it so that shorter times (higher
+    # inverted values) give a higher score, otherwise a city can come out upside down.
+    if pca.components_[0].sum() < 0:
+        pcs = -pcs
+
+    df['PCA_Raw_Value'] = pcs
+    df['UOI_Score'] = MinMaxScaler(feature_range=(0, 100)).fit_transform(pcs)
+    df['Rank'] = df['UOI_Score'].rank(ascending=False).astype(int)
+    return df
+
+
+def add_lisa_clusters(gdf, w, sig_level=SIG_LEVEL):
+    """
+    LISA on UOI_Score with weights w (as spatial_Analysis.py).
+    Adds LISA_Cluster, LISA_Label and LISA_Pval columns; returns the
+    number of significant wards.
+    """
+    from esda.moran import Moran_Local
+
+    lisa = Moran_Local(gdf['UOI_Score'].values, w)
+    sig = lisa.p_sim < sig_level
+
+    gdf['LISA_Cluster'] = lisa.q
+    gdf['LISA_Label'] = [LISA_LABELS[q] if s else "Not Significant"
+                         for q, s in zip(lisa.q, sig)]
+    gdf['LISA_Pval'] = lisa.p_sim
+    return int(sig.sum())